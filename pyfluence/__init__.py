@@ -27,5 +27,8 @@
 The primary class you will instanciate is :class:`pyfluence.confluence.Confluence`.
 """
 
+__version__ = '0.2.1'
+
 from .confluence import Confluence
 from .confluence import UPDATE_PREPEND,UPDATE_APPEND,UPDATE_REPLACE
+from .async_confluence import AsyncConfluence
@@ -0,0 +1,103 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .confluence import Confluence, CACHE_TTL, SEARCH_CACHE_TTL
+
+# the number of calls that can be in flight at once (kept within the session's connection pool size)
+ASYNC_WORKERS = 10
+
+
+def _async_method(name: str):
+    """
+    Creates a coroutine method that runs the Confluence method with the same name on the executor of the
+    AsyncConfluence instance.
+    :param name: The name of the Confluence method
+    :return: The coroutine method
+    """
+    method = getattr(Confluence, name)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self._run(getattr(self.confluence, name), *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncConfluence(object):
+    """
+    An asyncio version of :class:`pyfluence.confluence.Confluence`.  It has the same methods but they are
+        coroutines, so many requests can be in flight at once with asyncio.gather:
+
+            async with AsyncConfluence("admin", "admin", "http://localhost:1990/confluence") as confluence:
+                pages = await asyncio.gather(*[confluence.get_content(page_id) for page_id in page_ids])
+
+        Each call runs the blocking Confluence method on a thread pool, so the connection pooling and caching of
+        the wrapped client are shared by all of them.
+    """
+
+    def __init__(self, username: str, password: str, host: str, session: requests.Session = None,
+                 cache_ttl: float = CACHE_TTL, search_cache_ttl: float = SEARCH_CACHE_TTL,
+                 max_workers: int = ASYNC_WORKERS):
+        """
+        Initialize with username, password and host info
+        :param username: The username to login to confluence with
+        :param password: The password to login to confluence with
+        :param host: The host url (excluding the path to the API (e.g. http://myconfluence.company.com/wiki)
+        :param session: (see Confluence)
+        :param cache_ttl: (see Confluence)
+        :param search_cache_ttl: (see Confluence)
+        :param max_workers: The number of calls that can run at the same time
+        """
+        self.confluence: Confluence = Confluence(username, password, host, session=session, cache_ttl=cache_ttl,
+                                                 search_cache_ttl=search_cache_ttl)
+
+        # separate from the wrapped client's own executor which it uses for fetching pages of results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        """
+        Waits for calls in progress to finish then closes the wrapped client (see Confluence.close)
+        """
+        # this waits on our own executor so it has to run on the loop's default one
+        await asyncio.get_event_loop().run_in_executor(None, self._close)
+
+    def _close(self):
+        self._executor.shutdown()
+        self.confluence.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    get_content = _async_method("get_content")
+    get_content_many = _async_method("get_content_many")
+    search = _async_method("search")
+    get_content_properties = _async_method("get_content_properties")
+    set_content_property = _async_method("set_content_property")
+    get_page_properties = _async_method("get_page_properties")
+    create_space = _async_method("create_space")
+    create_content = _async_method("create_content")
+    delete_content = _async_method("delete_content")
+    delete_content_many = _async_method("delete_content_many")
+    delete_space = _async_method("delete_space")
+    update_title = _async_method("update_title")
+    update_content = _async_method("update_content")
+    update_content_raw = _async_method("update_content_raw")
+    get_content_info = _async_method("get_content_info")
+    get_content_ancestors = _async_method("get_content_ancestors")
+    add_content_attachment = _async_method("add_content_attachment")
+    get_attachment = _async_method("get_attachment")
+    get_children = _async_method("get_children")
+    get_attachments = _async_method("get_attachments")
+    get_user_by_key = _async_method("get_user_by_key")
+
+    build_page_properties_macro = staticmethod(Confluence.build_page_properties_macro)
@@ -1,12 +1,45 @@
-import json
+import base64
+import html
+import itertools
+import logging
 import os
-from json import JSONDecodeError
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Union, List
 
 import requests
 import time
 
-from munch import munchify
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
+
+from . import __version__
+
+try:
+    # orjson is much faster at (de)serializing large page bodies but it is optional
+    import orjson
+
+    def _json_dumps(ob) -> bytes:
+        # the json module turns non-string keys into strings so orjson has to be told to as well
+        return orjson.dumps(ob, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    import json
+
+    def _json_dumps(ob) -> bytes:
+        return json.dumps(ob, separators=(",", ":")).encode("utf-8")
+
+    _json_loads = json.loads
+    _JSONDecodeError = ValueError
+
+logger = logging.getLogger(__name__)
 
 METHOD_POST = "post"
 METHOD_GET = "get"
@@ -19,6 +52,65 @@ UPDATE_PREPEND = "prepend"
 UPDATE_APPEND = "append"
 UPDATE_REPLACE = "replace"
 
+API_ROOT = "rest/api/"
+
+# connection pool and retry settings for the session that Confluence creates for itself
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 20
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+# only requests that are safe to send twice are retried.  Uploads are streamed so their bodies can't be sent again
+#   and a write that actually succeeded would come back as a conflict.
+RETRY_ALLOWED_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# how long GET responses are reused for without asking the server (see Confluence.cached_reads).  Responses with
+#   an ETag are revalidated with If-None-Match after that.
+CACHE_TTL = 5.0
+# search results are reused for longer since dashboard style callers repeat the same queries
+SEARCH_CACHE_TTL = 10.0
+# the most response body bytes that are cached.  The oldest responses are dropped to stay under it so that walking a
+#   large paginated result doesn't keep every page in memory.
+RESPONSE_CACHE_BYTES = 8 * 1024 * 1024
+
+# how long to wait between polls of a long running task (doubling up to the max) and how long to wait overall
+ASYNC_POLL_INITIAL_DELAY = 0.05
+ASYNC_POLL_MAX_DELAY = 2.0
+ASYNC_MAX_WAIT = 300
+
+# the parts of the content entity that are returned by default by get_content and get_attachment
+CONTENT_EXPAND = ("space", "body.view", "version", "container")
+ATTACHMENT_EXPAND = ("ancestors", "version", "space", "container")
+
+# the page size requested by paginated queries (the largest that the REST API accepts for most resources)
+PAGINATION_LIMIT = 200
+# by default paginated queries stop once this many items have been retrieved
+PAGINATION_CEILING = 1000
+# the number of pages that are fetched concurrently once the total size of a paginated result is known
+PAGINATION_WORKERS = 8
+
+
+@lru_cache(maxsize=64)
+def _join_expand(expand: tuple) -> str:
+    """
+    Builds the value of the expand query parameter.  Most calls use one of a handful of fixed tuples (and every page
+    of a paginated query uses the same one) so the joined strings are kept.
+    :param expand: The parts of the entity to expand
+    :return: The comma separated list of parts
+    """
+    return ",".join(expand)
+
+
+def _full_url(host: str, path: str, api: str = API_ROOT):
+    """
+    Builds the full url to an API path
+    :param host: The host url without a trailing slash (see Confluence.host)
+    :param path: The path to the API with or without a leading slash
+    :param api: The root of the API that the path is relative to
+    :return: The full url
+    """
+    return f"{host}/{api}{path.lstrip('/')}"
+
 
 class ConfluenceResponseError(Exception):
     """
@@ -27,15 +119,29 @@ class ConfluenceResponseError(Exception):
 
     def __init__(self, status_code, msg):
         self.status_code = status_code
+        self.message = msg
+        self.json = None
 
         try:
-            self.json = json.loads(msg)
-        except JSONDecodeError:
-            self.message = msg
+            self.json = _json_loads(msg)
+        except _JSONDecodeError:
+            pass
 
         super(ConfluenceResponseError, self).__init__(msg)
 
 
+class ConfluenceTimeoutError(ConfluenceResponseError):
+    """
+    Raised when a long running task does not complete in the time allowed (ConfluenceResponseError(504))
+    """
+
+    def __init__(self, status_url, max_wait):
+        self.status_url = status_url
+        self.max_wait = max_wait
+        super(ConfluenceTimeoutError, self).__init__(
+            504, f"Timed out after {max_wait}s waiting for long running task at {status_url}")
+
+
 class ConfluenceContentNotFoundError(Exception):
     """
     Raised when content could not be found (ConfluenceResponseError(404))
@@ -46,6 +152,16 @@ class ConfluenceContentNotFoundError(Exception):
         super(ConfluenceContentNotFoundError, self).__init__(msg)
 
 
+class ConfluenceVersionConflictError(ConfluenceResponseError):
+    """
+    Raised when content is updated based on a version that is no longer the current one (ConfluenceResponseError(409))
+    """
+
+    def __init__(self, content_id, status_code, msg):
+        self.content_id = content_id
+        super(ConfluenceVersionConflictError, self).__init__(status_code, msg)
+
+
 class ConfluenceIncompatibleRepresentationError(Exception):
     """
     Raised when an action is attempted that is not possible because the representation of content is not
@@ -68,6 +184,21 @@ class ConfluenceInvalidInputError(Exception):
     pass
 
 
+class _BasicAuth(AuthBase):
+    """
+    Basic authentication with the header encoded once rather than by requests on every call.  Being an auth (rather
+    than a plain header) also stops requests from replacing the credentials with ones from a netrc file.
+    """
+
+    def __init__(self, username: str, password: str):
+        token = base64.b64encode(f"{username}:{password}".encode('utf-8')).decode('ascii')
+        self.header = f"Basic {token}"
+
+    def __call__(self, r):
+        r.headers['Authorization'] = self.header
+        return r
+
+
 class Confluence(object):
     """
     A simple Atlassian Confluence REST API client.  Initialize the object with the username, password and host url
@@ -76,131 +207,353 @@ class Confluence(object):
 
     """
 
-    def __init__(self, username: str, password: str, host: str):
+    def __init__(self, username: str, password: str, host: str, session: requests.Session = None,
+                 cache_ttl: float = CACHE_TTL, search_cache_ttl: float = SEARCH_CACHE_TTL):
         """
         Initialize with username, password and host info
         :param username: The username to login to confluence with
         :param password: The password to login to confluence with
         :param host: The host url (excluding the path to the API (e.g. http://myconfluence.company.com/wiki)
+        :param session: An optional requests session to send all requests through.  If not given, one is created
+            so that connections to the host are kept alive and reused across calls.  A session that is given is not
+            modified (the credentials are sent with each request rather than set on it) so it can be shared.
+        :param cache_ttl: The number of seconds that the response to a GET is reused for without asking the server
+            again.  Use 0 to always ask (responses with an ETag are still revalidated rather than re-downloaded).
+        :param search_cache_ttl: The same as cache_ttl but for the results of search.
         """
         self.username: str = username
         self.password: str = password
-        self.host: str = host
+        self.host: str = host.rstrip("/")
+        self._session: requests.Session = session or self._create_session()
+        self._owns_session: bool = session is None
+
+        auth = _BasicAuth(username, password)
+        default_headers = {
+            'Accept': 'application/json',
+            'User-Agent': f"pyfluence/{__version__}",
+        }
+
+        # a session that was passed in may be shared with other clients or used for other hosts so it is left
+        #   alone and our headers and credentials are sent with each request instead
+        self._request_headers: dict = {}
+        self._request_auth: Union[_BasicAuth, None] = None
+        if self._owns_session:
+            self._session.headers.update(default_headers)
+            self._session.auth = auth
+        else:
+            self._request_headers = default_headers
+            self._request_auth = auth
+
+        # (url, params) -> (etag, response body, time fetched) for GET requests
+        self.cache_ttl: float = cache_ttl
+        self.search_cache_ttl: float = search_cache_ttl
+        self._response_cache: OrderedDict = OrderedDict()
+        self._response_cache_bytes: int = 0
+
+        # guards the cache since pages of paginated queries are fetched on several threads
+        self._cache_lock = threading.Lock()
+
+        # shared by all paginated queries and bulk operations so that worker threads are started once and then
+        #   reused.  Nothing that runs on it waits on it so it can't deadlock.
+        self._executor = ThreadPoolExecutor(max_workers=PAGINATION_WORKERS)
+
+        # whether the server can create or update an attachment with a single PUT (None until the first upload)
+        self._attachment_put_supported: Union[bool, None] = None
+
+    def close(self):
+        """
+        Closes the connections held by this instance's session and stops its worker threads.  A session that was
+        passed in to the constructor is left open for its owner to close.
+        """
+        self._executor.shutdown()
+        if self._owns_session:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _create_session():
+        """
+        Creates a session with a connection pool and retries for transient server errors mounted for both
+        http and https.
+        :return: The new requests session
+        """
+        session = requests.Session()
+        # raise_on_status is off so that the last failed response still surfaces as a ConfluenceResponseError
+        retry = Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR, status_forcelist=RETRY_STATUS_FORCELIST,
+                      allowed_methods=RETRY_ALLOWED_METHODS, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
 
     # noinspection PyUnresolvedReferences
     def _query(self, path: str, data: dict = None, method: str = METHOD_GET, expand: List[str] = (),
-               files: dict = None, headers: dict = None, sync: bool = True, api_root: str = None):
+               files: dict = None, headers: dict = None, sync: bool = True, api_root: str = API_ROOT,
+               max_wait: float = ASYNC_MAX_WAIT, cache_ttl: Union[float, None] = None):
         """
         Generalized Confluence REST API method.  All requests come through this method eventually.
         :param path: The path to the API (excluding the root)
         :param data: The input to the API
-        :param method: The method to use to access the data. If the method is GET then the data value will be
-            interpreted as query parameters.  Otherwise it will be converted to JSON and placed in the body of the
-            request.
+        :param method: The method to use to access the data. If the method is POST or PUT then the data value will
+            be converted to JSON and placed in the body of the request.  Otherwise it will be interpreted as query
+            parameters.
         :param sync: If true and this api call executes a long running task then it won't return until the
                 task is complete.
+        :param max_wait: The number of seconds to wait for a long running task before giving up with a
+                ConfluenceTimeoutError.
+        :param cache_ttl: How long a cached response to a GET can be reused for.  Defaults to self.cache_ttl.
         :return: Returns the JSON representation of the result from the API.
         """
-
-        def generate_full_url(url_path, host, api=None):
-            api = api or "rest/api/"
-            url_path = url_path[1:] if url_path[0] == "/" else url_path
-            host = host[0:-1] if host[-1] == "/" else host
-            return "{host}/{api}{path}".format(host=host, api=api, path=url_path)
-
-        # string leading slash
-        url = generate_full_url(path, self.host, api=api_root)
-
-        data = data or {}
-        data['expand'] = ",".join(expand)
-
-        # use form encoding for params if a file is given, otherwise assume that we can
-        #   put JSON in the body.
-        json_params = form_params = None
-        if files:
-            form_params = data
-        else:
-            json_params = data
-
-        if method == METHOD_POST:
-            response = requests.post(url, data=form_params, json=json_params, auth=(self.username, self.password),
-                                     files=files, headers=headers)
-        elif method == METHOD_PUT:
-            response = requests.put(url, data=form_params, json=json_params, auth=(self.username, self.password),
-                                    files=files, headers=headers)
-        elif method == METHOD_DELETE:
-            response = requests.delete(url, auth=(self.username, self.password), files=files, headers=headers)
-        elif method == METHOD_OPTIONS:
-            response = requests.options(url, auth=(self.username, self.password))
-        elif method == METHOD_HEAD:
-            response = requests.head(url, auth=(self.username, self.password))
+        url = _full_url(self.host, path, api_root)
+        cache_ttl = self.cache_ttl if cache_ttl is None else cache_ttl
+
+        # copy the caller's data so that it isn't modified and only send expand if something was asked for
+        params = dict(data) if data else {}
+        if isinstance(expand, str):
+            # e.g. ("ancestors") instead of ("ancestors",) which would otherwise expand each letter
+            raise TypeError(f"expand must be a list or tuple of strings, not the string {expand!r}")
+        if expand:
+            params['expand'] = _join_expand(tuple(expand))
+
+        # POST and PUT use form encoding for params if a file is given, otherwise assume that we can put JSON in the
+        #   body.  The JSON is serialized here (with orjson if it's installed) rather than by requests.  Every other
+        #   method sends the params in the query string.
+        query = body = cache_key = cached = None
+        if method in (METHOD_POST, METHOD_PUT):
+            if files:
+                # the multipart body is streamed from the open files as it is sent rather than being built in
+                #   memory by requests
+                body = MultipartEncoder(fields={**{k: str(v) for k, v in params.items()}, **files})
+                headers = {'Content-Type': body.content_type, **(headers or {})}
+                files = None
+            else:
+                body = _json_dumps(params)
+                headers = {'Content-Type': 'application/json', **(headers or {})}
         else:
-            response = requests.get(url, params=data, auth=(self.username, self.password), headers=headers)
+            query = params
+
+        if method == METHOD_GET:
+            # if we have seen this exact request recently, reuse the response.  Otherwise ask the server to only
+            #   send the body if it changed.  The body is kept as bytes and decoded on every use so that callers
+            #   can modify what they get back without changing the cache.
+            cache_key = (url, tuple(sorted(params.items())))
+            with self._cache_lock:
+                cached = self._response_cache.get(cache_key)
+            if cached:
+                etag, content, fetched_at = cached
+                if time.monotonic() - fetched_at < cache_ttl:
+                    return _json_loads(content)
+                if etag:
+                    headers = {'If-None-Match': etag, **(headers or {})}
+
+        if self._request_headers:
+            headers = {**self._request_headers, **(headers or {})}
+
+        response = self._session.request(method.upper(), url, params=query, data=body, files=files, headers=headers,
+                                         auth=self._request_auth)
+
+        if cache_key:
+            if response.status_code == 304 and cached:
+                self._cache_response(cache_key, cached[0], cached[1])
+                return _json_loads(cached[1])
+
+            etag = response.headers.get('ETag')
+            if response.status_code == 200 and (etag or cache_ttl > 0):
+                self._cache_response(cache_key, etag, response.content)
 
         if response.status_code >= 400:
             raise ConfluenceResponseError(response.status_code, response.text)
 
+        if method not in (METHOD_GET, METHOD_OPTIONS, METHOD_HEAD):
+            self._invalidate_cache(url)
+
         if response.status_code == 204:
             # no content to return
             return None
 
         if response.status_code == 202 and sync is True:
-            # poll until complete
+            # poll until complete, starting with short waits so that quick tasks return quickly and backing off
+            #   so that slow ones don't hammer the server
+            status_path = _json_loads(response.content)['links']['status']
+            status_url = _full_url(self.host, status_path, api="")
+            delay = ASYNC_POLL_INITIAL_DELAY
+            deadline = time.monotonic() + max_wait
             while response.status_code == 202:
-                status_url = generate_full_url(url_path=response.json()['links']['status'], host=self.host, api="")
-                response = requests.get(status_url, auth=(self.username, self.password))
-                time.sleep(1)
+                # the server can tell us how long to wait before asking again
+                try:
+                    wait = float(response.headers.get('Retry-After', delay))
+                except ValueError:
+                    wait = delay
 
-        return response.json()
+                if time.monotonic() + wait > deadline:
+                    raise ConfluenceTimeoutError(status_url, max_wait)
 
-    def _paginated_query(self, path: str, data: dict = None, limit: int = 25, start: int = 0, expand: List[str] = (),
-                         child_node=None):
+                time.sleep(wait)
+                delay = min(delay * 2, ASYNC_POLL_MAX_DELAY)
+                response = self._session.get(status_url, headers=self._request_headers, auth=self._request_auth)
+
+            if response.status_code >= 400:
+                raise ConfluenceResponseError(response.status_code, response.text)
+
+        return _json_loads(response.content) if response.content else None
+
+    def _cache_response(self, cache_key: tuple, etag: Union[str, None], content: bytes):
         """
-        For queries that return paginated data, this will retrieve all pages of the result, not just the first.
+        Keeps the body of a GET response for reuse by later identical requests
+        :param cache_key: The url and query parameters of the request
+        :param etag: The ETag the server gave the response, if any
+        :param content: The raw body of the response
+        """
+        with self._cache_lock:
+            self._uncache(cache_key)
+            if len(content) > RESPONSE_CACHE_BYTES:
+                return
+
+            self._response_cache[cache_key] = (etag, content, time.monotonic())
+            self._response_cache_bytes += len(content)
+            while self._response_cache_bytes > RESPONSE_CACHE_BYTES:
+                self._uncache(next(iter(self._response_cache)))
+
+    def _uncache(self, cache_key: tuple):
+        """
+        Drops a cached response if there is one.  The cache lock must be held.
+        :param cache_key: The url and query parameters of the request
+        """
+        cached = self._response_cache.pop(cache_key, None)
+        if cached:
+            self._response_cache_bytes -= len(cached[1])
+
+    def _invalidate_cache(self, url: str):
+        """
+        Called after a successful write.  Drops cached GET responses for the given resource and the resources
+        beneath it.  Any other cached response may have been affected as well (e.g. a new page shows up in its
+        parent's children) so the rest are checked with the server before they are used again, or dropped if
+        they have no ETag to check with.
+        :param url: The full url of the resource that was modified
+        """
+        url = url.rstrip("/")
+        with self._cache_lock:
+            for key, (etag, content, _) in list(self._response_cache.items()):
+                if key[0].startswith(url) or not etag:
+                    self._uncache(key)
+                else:
+                    self._response_cache[key] = (etag, content, 0.0)
+
+    @contextmanager
+    def cached_reads(self, ttl: float = 30.0):
+        """
+        Use as a context manager to reuse GET responses (including searches) for longer than cache_ttl (e.g. for a
+        bulk job that reads the same pages repeatedly).  Changes made through this instance are always seen, changes
+        made elsewhere may not be until the ttl expires.
+            with confluence.cached_reads(ttl=60):
+                ...
+        :param ttl: The number of seconds to reuse a response for
+        """
+        previous_ttls = self.cache_ttl, self.search_cache_ttl
+        self.cache_ttl = self.search_cache_ttl = ttl
+        try:
+            yield self
+        finally:
+            self.cache_ttl, self.search_cache_ttl = previous_ttls
+
+    def invalidate_search(self):
+        """
+        Drops all cached search results so that the next search asks the server.  Changes made through this
+        instance already do this, use it when content may have been changed by someone else.
+        """
+        url = _full_url(self.host, "search")
+        with self._cache_lock:
+            for key in [key for key in self._response_cache if key[0] == url]:
+                self._uncache(key)
+
+    def _iter_paginated(self, path: str, data: dict = None, limit: int = PAGINATION_LIMIT, start: int = 0,
+                        expand: List[str] = (), child_node=None, max_results: Union[int, None] = PAGINATION_CEILING,
+                        cache_ttl: Union[float, None] = None):
+        """
+        For queries that return paginated data, this yields each item of every page of the result (not just the
+        first) as soon as its page arrives.  Pages after the first are fetched ahead concurrently.  If the caller
+        stops iterating early then pages that have not been fetched yet are not requested.
         :param path: (see _query)
         :param data:  (see _query)
-        :param limit: The number of items to retrieve at once.
+        :param limit: The number of items to retrieve at once.  The server may return fewer per page than this in
+            which case the page size it gives is used for the rest of the pages.
         :param start: Which item # to start at.
         :param child_node: If the returned list is not in the root of the resulting object, then specify the
             child node in which to find the "results" field and the size or totalSize field.
-        :return: Returns a dict containing the total number of items found and the results themselves.
+        :param max_results: Stop after this many items in case the query is too general.  None retrieves them all.
+        :param cache_ttl: (see _query)
+        :return: A generator of the items in the results
         """
         data = data or {}
 
-        # first at least one iteration (there's no do while in python)
-        remaining = 1
-        results = []
-        result_ob = None
-        total_size = 0
-        while remaining > 0:
-
-            data['limit'] = limit
-            data['start'] = start
-
-            # Get page and append to final list
-            result_ob = self._query(path=path, data=data, method=METHOD_GET, expand=expand)
-            result_ob_root = result_ob if not child_node else result_ob[child_node]
-            results.extend(result_ob_root['results'])
-
-            # need to have a ceiling in case the query is too general
-            if len(results) >= 1000:
-                break
-
-            # Calculate the remaining items after we have gotten the last batch and increment the new start
-            total_size = result_ob_root['totalSize'] if 'totalSize' in result_ob_root else result_ob_root['size']
-            remaining = total_size - (result_ob_root['start'] + result_ob_root['size'])
-            start += limit
-
-        if result_ob:
-            # sanity check
-            assert (len(results) == total_size)
-
+        def get_page(page_start, page_limit):
+            page_data = dict(data, limit=page_limit, start=page_start)
+            result_ob = self._query(path=path, data=page_data, method=METHOD_GET, expand=expand, cache_ttl=cache_ttl)
+            return result_ob if not child_node else result_ob[child_node]
+
+        # the first page tells us how many items there are in total
+        first_page = get_page(start, limit)
+        first_start = first_page['start']
+        total_size = first_page['totalSize'] if 'totalSize' in first_page else first_page['size']
+        # the server may return fewer than were asked for.  The later pages are asked for in the size it did
+        #   return so that their offsets and sizes agree and they neither overlap nor leave gaps.
+        step = first_page['size'] or limit
+
+        end = total_size if max_results is None else min(total_size, start + max_results)
+        remaining = end - start
+
+        # the remaining pages are independent of each other so keep a few of them in flight while yielding
+        page_starts = iter(range(first_start + first_page['size'], end, step))
+        pending = deque(self._executor.submit(get_page, page_start, step)
+                        for page_start in itertools.islice(page_starts, PAGINATION_WORKERS))
+        page = first_page
+        try:
+            while True:
+                items = page['results'][:max(remaining, 0)]
+                remaining -= len(items)
+                yield from items
+
+                if not pending:
+                    break
+
+                page = pending.popleft().result()
+                next_start = next(page_starts, None)
+                if next_start is not None:
+                    pending.append(self._executor.submit(get_page, next_start, step))
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if end == total_size and remaining != 0:
+            logger.warning("pagination size mismatch for %s: %d != %d", path, end - start - remaining, end - start)
+
+    def _paginated_query(self, path: str, data: dict = None, limit: int = PAGINATION_LIMIT, start: int = 0,
+                         expand: List[str] = (), child_node=None, max_results: Union[int, None] = PAGINATION_CEILING,
+                         cache_ttl: Union[float, None] = None):
+        """
+        For queries that return paginated data, this will retrieve all pages of the result, not just the first.
+        :param path: (see _iter_paginated)
+        :param data:  (see _iter_paginated)
+        :param limit: (see _iter_paginated)
+        :param start: (see _iter_paginated)
+        :param child_node: (see _iter_paginated)
+        :param max_results: (see _iter_paginated)
+        :param cache_ttl: (see _query)
+        :return: Returns a dict containing the total number of items found and the results themselves.
+        """
+        results = list(self._iter_paginated(path, data=data, limit=limit, start=start, expand=expand,
+                                            child_node=child_node, max_results=max_results, cache_ttl=cache_ttl))
         return {
             "size": len(results),
             "results": results
         }
 
-    def get_content(self, page_id: str, expand=("space", "body.view", "version", "container")):
+    def get_content(self, page_id: str, expand=CONTENT_EXPAND):
         """
         Gets the content with the given ID
         :param page_id: The ID of the content
@@ -209,7 +562,7 @@ class Confluence(object):
         """
         expand = expand or ()
         try:
-            result = self._query('/content/' + str(page_id),
+            result = self._query(f'/content/{page_id}',
                                  expand=expand,
                                  method=METHOD_GET)
             return result
@@ -219,16 +572,43 @@ class Confluence(object):
             else:
                 raise e
 
-    def search(self, cql: str, expand: Union[str, None] = None):
+    def get_content_many(self, page_ids: List[str], expand=CONTENT_EXPAND):
+        """
+        Gets several pieces of content at once.  The requests are sent concurrently rather than one after another.
+        :param page_ids: The IDs of the content
+        :param expand: (see get_content)
+        :return: A dict of each ID to its content (or None if it wasn't found).  If a request fails then
+            ConfluenceResponseError is raised and the requests that haven't been sent yet are cancelled.
+        """
+        page_ids = list(page_ids)
+        return dict(zip(page_ids, self._executor.map(lambda page_id: self.get_content(page_id, expand=expand),
+                                                     page_ids)))
+
+    def search(self, cql: str, expand: Union[List[str], None] = None,
+               max_results: Union[int, None] = PAGINATION_CEILING):
         """
         Executes a CQL query to retrieve information about the content.
         :param cql: The CQL query
             (see https://developer.atlassian.com/confdev/confluence-server-rest-api/advanced-searching-using-cql)
         :param expand: The parts of each page to return in the results (avoid using body.view)
+        :param max_results: The most results to return.  None returns all of them.
         :return: Returns a dict containing the list of objects found and the total number found
         """
-        expand = expand or []
-        return self._paginated_query('/search', data={"cql": cql, "expand": ",".join(expand)})
+        return self._paginated_query('/search', data={"cql": cql}, expand=expand or (), max_results=max_results,
+                                     cache_ttl=self.search_cache_ttl)
+
+    def search_iter(self, cql: str, expand: Union[List[str], None] = None,
+                    max_results: Union[int, None] = PAGINATION_CEILING):
+        """
+        The same as search but yields each result as soon as its page arrives, so callers that only need the first
+        few hits do not wait for (or request) the rest.
+        :param cql: (see search)
+        :param expand: (see search)
+        :param max_results: (see search)
+        :return: A generator of the objects found
+        """
+        return self._iter_paginated('/search', data={"cql": cql}, expand=expand or (), max_results=max_results,
+                                    cache_ttl=self.search_cache_ttl)
 
     def get_content_properties(self, page_id: str):
         """
@@ -272,15 +652,15 @@ class Confluence(object):
         assert (isinstance(headers, (list, tuple)))
 
         result = self._query('/1.0/detailssummary/lines',
-                             data={"cql": "id=%s" % str(page_id), "spaceKey": space, "headers": ",".join(headers)},
+                             data={"cql": f"id={page_id}", "spaceKey": space, "headers": ",".join(headers)},
                              api_root="rest/masterdetail/")
 
         if not result:
             return None
 
-        result = munchify(result)
-        if len(result.detailLines) > 0 and len(result.detailLines[0].details) == len(headers):
-            return dict(zip(headers, result.detailLines[0].details))
+        lines = result.get('detailLines') or []
+        if lines and len(lines[0].get('details', [])) == len(headers):
+            return dict(zip(headers, lines[0]['details']))
 
         return None
 
@@ -359,7 +739,20 @@ class Confluence(object):
         :param page_id: The ID of the content to delete
         :return: Nothing returned if successful.  ConfluenceResponseError raised if failure.
         """
-        self._query("content/%s" % str(page_id), method=METHOD_DELETE)
+        self._query(f"content/{page_id}", method=METHOD_DELETE)
+
+    def delete_content_many(self, page_ids: List[str]):
+        """
+        Deletes several pieces of content at once.  The requests are sent concurrently rather than one after another.
+        :param page_ids: The IDs of the content to delete
+        :return: Nothing returned if successful.  Every delete is attempted, then ConfluenceResponseError is raised
+            for the first one that failed.
+        """
+        futures = [self._executor.submit(self.delete_content, page_id) for page_id in page_ids]
+        wait(futures)
+        for future in futures:
+            if future.exception():
+                raise future.exception()
 
     def delete_space(self, key: str):
         """
@@ -370,10 +763,11 @@ class Confluence(object):
         # note that we set sync to false.  That's because if we poll for success we will eventually
         #   get a 404 because the space is no longer there which will yield an error even though the delete succeeded
         #   most likely.
-        self._query("space/%s" % str(key), method=METHOD_DELETE, sync=False)
+        self._query(f"space/{key}", method=METHOD_DELETE, sync=False)
 
     def update_title(self, page_id: str, title: str, update_type: str = UPDATE_REPLACE):
-        page = self.get_content(page_id, expand=("space", "body.view", "version", "container", "ancestors"))
+        # the title and type are always returned so only the version is needed
+        page = self.get_content(page_id, expand=("version",))
         if not page:
             raise ConfluenceContentNotFoundError(page_id, "Unable to find updateable page during page update request")
 
@@ -397,7 +791,7 @@ class Confluence(object):
                 "type": page['type']
             }
 
-            return self._query("content/%s" % str(page_id), data=param_dict, method=METHOD_PUT)
+            return self._query(f"content/{page_id}", data=param_dict, method=METHOD_PUT)
         else:
             return None
 
@@ -407,27 +801,35 @@ class Confluence(object):
         Update a page either by replacing the entire page or prepending or appending content
         :param page_id:  The page_id of the page to update
         :param html_markup: The HTML markup to update with ('storage' representation)
-        :param wiki_markup: The Wiki markup to update with ('wiki' representation)
+        :param wiki_markup: The Wiki markup to update with ('wiki' representation).  Only for UPDATE_REPLACE since
+            the existing body is in the storage representation and can't be combined with wiki markup.
         :param update_type: Whether to replace, prepend or append (UPDATE_REPLACE, UPDATE_PREPEND, UPDATE_APPEND)
-        :return:
+        :return: Returns the updated content.  ConfluenceIncompatibleRepresentationError is raised if prepending
+            or appending without html_markup.
         """
-        # first get information about the page
-        page = self.get_content(page_id, expand=("space", "body.view", "version", "container", "ancestors"))
+        # first get information about the page.  The current body is only needed when adding to it and can be
+        #   large so it isn't fetched when it is being replaced.  When it is needed, the storage format is what gets
+        #   saved and is usually much smaller than the rendered view.
+        expand = ("space", "version", "ancestors")
+        if update_type != UPDATE_REPLACE:
+            expand += ("body.storage",)
+
+        page = self.get_content(page_id, expand=expand)
         if not page:
             raise ConfluenceContentNotFoundError(page_id, "Unable to find updateable page during page update request")
 
-        representation = page['body']['view']['representation']
-        body = page['body']['view']['value']
-
-        if representation == 'storage' and not html_markup and update_type != UPDATE_REPLACE:
-            raise ConfluenceIncompatibleRepresentationError(content_id=page_id, representation_expected=representation,
-                                                            representation_given="wiki")
+        body = ""
+        if update_type != UPDATE_REPLACE:
+            # the stored body is always in the storage representation so only html markup can be added to it
+            if not html_markup:
+                raise ConfluenceIncompatibleRepresentationError(content_id=page_id,
+                                                                representation_expected="storage",
+                                                                representation_given="wiki")
 
-        if representation == 'wiki' and not wiki_markup and update_type != UPDATE_REPLACE:
-            raise ConfluenceIncompatibleRepresentationError(content_id=page_id, representation_expected=representation,
-                                                            representation_given="storage")
+            body = page['body']['storage']['value']
 
         new_value = html_markup or wiki_markup
+        new_representation = "storage" if html_markup else "wiki"
         final_value = ""
         if update_type == UPDATE_REPLACE:
             final_value = new_value
@@ -436,33 +838,61 @@ class Confluence(object):
         elif update_type == UPDATE_PREPEND:
             final_value = new_value + body
 
+        # keep the page where it is.  The API only needs the id of the parent.
+        ancestors = None
+        if page.get('ancestors'):
+            ancestors = [{'id': page['ancestors'][-1]['id']}]
+
+        return self.update_content_raw(page_id, body=final_value, version=page['version']['number'],
+                                       title=page['title'], space_key=page['space']['key'], type_=page['type'],
+                                       ancestors=ancestors, representation=new_representation)
+
+    def update_content_raw(self, page_id: str, body: str, version: int, title: str, space_key: str,
+                           type_: str = "page", ancestors: List[dict] = None, representation: str = "storage"):
+        """
+        Replaces the body of a page without fetching it first.  Use this instead of update_content when you already
+        have the page's current version number and title (e.g. from an earlier get_content or search).
+        :param page_id: The page_id of the page to update
+        :param body: The new body of the page
+        :param version: The version number of the page that this update is based on.  The page is saved as the
+            next version.
+        :param title: The title of the page
+        :param space_key: The key of the space the page is in
+        :param type_: The content type ("page", "blogpost", etc.)
+        :param ancestors: If given, the ancestors to set on the page (e.g. [{"id": parent_id}])
+        :param representation: The representation of the body ("storage" or "wiki")
+        :return: Returns the updated content as given by the confluence API.  ConfluenceVersionConflictError is
+            raised if the page has been changed since the given version.
+        """
         param_dict = {
-            "id": str(page_id),
-            "title": page['title'],
+            "id": f"{page_id}",
+            "title": title,
             "space": {
-                "key": page['space']['key']
+                "key": space_key
             },
             "body":
                 {
                     "storage": {
-                        "value": final_value,
-                        "representation": "storage" if html_markup else "wiki"
+                        "value": body,
+                        "representation": representation
                     }
                 },
             "version": {
-                "number": page['version']['number'] + 1
+                "number": version + 1
             },
-            "type": page['type']
+            "type": type_
         }
 
-        if 'ancestors' in page and page['ancestors']:
-            anc = page['ancestors'][-1]
-            del anc['_links']
-            del anc['_expandable']
-            del anc['extensions']
-            param_dict['ancestors'] = [anc]
+        if ancestors:
+            param_dict['ancestors'] = ancestors
 
-        return self._query("content/%s" % str(page_id), data=param_dict, method=METHOD_PUT)
+        try:
+            return self._query(f"content/{page_id}", data=param_dict, method=METHOD_PUT)
+        except ConfluenceResponseError as e:
+            if e.status_code == 409:
+                raise ConfluenceVersionConflictError(page_id, e.status_code, str(e))
+            else:
+                raise e
 
     def get_content_info(self, page_id: str):
         """
@@ -476,10 +906,10 @@ class Confluence(object):
         """
         Get basic content information plus the ancestors property
         :param page_id: The ID of the page to get info about
-        :return: Returns ancestor information for the given page.
+        :return: Returns ancestor information for the given page or None if the page wasn't found.
         """
-        content = self.get_content(page_id, expand=["ancestors"])
-        return content.json()['ancestors']
+        content = self.get_content(page_id, expand=("ancestors",))
+        return content['ancestors'] if content else None
 
     def add_content_attachment(self, file: str, page_id: str):
         """
@@ -489,33 +919,81 @@ class Confluence(object):
         :param page_id: The ID of the content to add to
         :return: The result of the query.
         """
-        # first, determine if there's an attachment with this name
-        add_new_version = None
         filename = os.path.basename(file)
-        attachments = self.get_attachments(page_id)
-        for a in attachments['results']:
-            if a['title'] == filename:
-                add_new_version = a
 
         with open(file, 'rb') as fp:
-            if not add_new_version:
-                r = self._query("content/{page_id}/child/attachment".format(page_id=page_id),
-                                method=METHOD_POST,
-                                files={"file": fp},
-                                data={'comment': 'new version of %s' % file, 'minorEdit': True},
-                                headers=({'X-Atlassian-Token': 'no-check'}))
+            if self._attachment_put_supported is not False:
+                try:
+                    # PUT creates the attachment or adds a new version of an existing one with the same name so it
+                    #   only takes one request either way
+                    result = self._query(f"content/{page_id}/child/attachment",
+                                         method=METHOD_PUT,
+                                         files={"file": (filename, fp, 'application/octet-stream')},
+                                         data={'comment': f'new version of {file}', 'minorEdit': True},
+                                         headers=({'X-Atlassian-Token': 'no-check'}))
+                    self._attachment_put_supported = True
+
+                    # a new version of an existing attachment is returned on its own, the same as the POST path
+                    attachment = result['results'][0] if result and result.get('results') else None
+                    if attachment and attachment.get('version', {}).get('number', 1) > 1:
+                        return attachment
+                    return result
+                except ConfluenceResponseError as e:
+                    # older servers don't support PUT here.  Once we know the server does then a 404 means that
+                    #   the content doesn't exist.
+                    if e.status_code not in (404, 405) or self._attachment_put_supported:
+                        raise e
+
+                fp.seek(0)
+
+            result = self._post_content_attachment(fp, file, page_id)
+            self._attachment_put_supported = False
+            return result
 
-            else:
-                url = "content/{page_id}/child/attachment/{attachment_id}/data".format(page_id=page_id,
-                                                                                       attachment_id=add_new_version[
-                                                                                           'id'])
-                r = self._query(url,
-                                method=METHOD_POST,
-                                files={"file": fp},
-                                data={'minorEdit': True, 'comment': 'new version of %s' % file},
-                                headers=({'X-Atlassian-Token': 'no-check'}))
+    def _post_content_attachment(self, fp, file: str, page_id: str):
+        """
+        Adds an attachment to the given page, or a new version of it, for servers that do not support creating
+        attachments with PUT.
+        :param fp: The open file to upload
+        :param file: The path of the file
+        :param page_id: The ID of the content to add to
+        :return: The result of the query.
+        """
+        filename = os.path.basename(file)
 
-        return r
+        try:
+            # most uploads are new attachments so try to create it first rather than listing all the
+            #   attachments on the page to find out whether it already exists.
+            return self._query(f"content/{page_id}/child/attachment",
+                               method=METHOD_POST,
+                               files={"file": (filename, fp, 'application/octet-stream')},
+                               data={'comment': f'new version of {file}', 'minorEdit': True},
+                               headers=({'X-Atlassian-Token': 'no-check'}))
+        except ConfluenceResponseError as e:
+            # confluence refuses to create an attachment with the same name as an existing one
+            if e.status_code not in (400, 409):
+                raise e
+
+            existing = self._get_attachment_by_filename(page_id, filename)
+            if not existing:
+                raise e
+
+        fp.seek(0)
+        return self._query(f"content/{page_id}/child/attachment/{existing['id']}/data",
+                           method=METHOD_POST,
+                           files={"file": (filename, fp, 'application/octet-stream')},
+                           data={'minorEdit': True, 'comment': f'new version of {file}'},
+                           headers=({'X-Atlassian-Token': 'no-check'}))
+
+    def _get_attachment_by_filename(self, page_id: str, filename: str):
+        """
+        Looks up a single attachment on the given content by its file name
+        :param page_id: The ID of the content the attachment belongs to
+        :param filename: The file name of the attachment
+        :return: The attachment or None if there is no attachment with that name
+        """
+        result = self._query(f"content/{page_id}/child/attachment", data={'filename': filename})
+        return result['results'][0] if result and result['results'] else None
 
     def get_attachment(self, attachment_id: str):
         """
@@ -523,41 +1001,58 @@ class Confluence(object):
         :param attachment_id: The ID of the attachment content (
         :return:
         """
-        return self.get_content(attachment_id, expand=("ancestors", "version", "space", "container"))
+        return self.get_content(attachment_id, expand=ATTACHMENT_EXPAND)
 
-    def get_children(self, page_id: str):
+    def get_children(self, page_id: str, max_results: Union[int, None] = PAGINATION_CEILING):
         """
         Gets all direct children of the given page.
         :param page_id:
+        :param max_results: The most children to return.  None returns all of them.
         :return:
         """
-        return self._paginated_query(path="content/{page_id}/child".format(page_id=page_id), expand=["page"],
-                                     child_node="page")
+        return self._paginated_query(path=f"content/{page_id}/child", expand=("page",), child_node="page",
+                                     max_results=max_results)
 
-    def get_attachments(self, page_id: str):
+    def get_attachments(self, page_id: str, max_results: Union[int, None] = PAGINATION_CEILING):
         """
         Gets a list of all the attachments that are children of the given content
         :param page_id:
+        :param max_results: The most attachments to return.  None returns all of them.
         :return: An object containing attachment data for the given parent content
         """
-        return self._paginated_query(path="content/{page_id}/child".format(page_id=page_id), expand=["attachment"],
-                                     child_node="attachment")
+        return self._paginated_query(path=f"content/{page_id}/child", expand=("attachment",), child_node="attachment",
+                                     max_results=max_results)
+
+    def get_attachments_iter(self, page_id: str, max_results: Union[int, None] = PAGINATION_CEILING):
+        """
+        The same as get_attachments but yields each attachment as soon as its page arrives
+        :param page_id:
+        :param max_results: (see get_attachments)
+        :return: A generator of the attachments of the given content
+        """
+        return self._iter_paginated(path=f"content/{page_id}/child", expand=("attachment",), child_node="attachment",
+                                    max_results=max_results)
 
     def get_user_by_key(self, key):
         return self._query(path="user", data={key: key})
 
     @staticmethod
-    def build_page_properties_macro(props: dict):
-
-        bld = [
-            "<ac:structured-macro ac:name=\"details\"><ac:rich-text-body>\n", '<table class="wrapped">',
-            '<colgroup>%s</colgroup>' % ''.join(['<col />' for _ in range(len(props))]),
-            '<tbody>'
-        ]
-
-        for k, v in props.items():
-            bld.append("<tr><td>{k}</td><td>{v}</td></tr>".format(k=k, v=v))
-
-        bld.append("</tbody></table>")
-        bld.append("</ac:rich-text-body></ac:structured-macro>")
-        return "\n".join(bld)
+    def build_page_properties_macro(props: dict, escape: bool = False):
+        """
+        Builds the storage format markup for a Page Properties macro containing a table of the given properties.
+        :param props: The key-value pairs to put in the table
+        :param escape: If true, the keys and values are HTML escaped.  Leave this off if they contain markup.
+        :return: The markup for the macro
+        """
+        if escape:
+            props = {html.escape(str(k)): html.escape(str(v)) for k, v in props.items()}
+
+        cols = '<col />' * len(props)
+        rows = "".join(f"<tr><td>{k}</td><td>{v}</td></tr>\n" for k, v in props.items())
+        return ("<ac:structured-macro ac:name=\"details\"><ac:rich-text-body>\n\n"
+                '<table class="wrapped">\n'
+                f"<colgroup>{cols}</colgroup>\n"
+                "<tbody>\n"
+                f"{rows}"
+                "</tbody></table>\n"
+                "</ac:rich-text-body></ac:structured-macro>")
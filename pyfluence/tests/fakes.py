@@ -0,0 +1,74 @@
+"""
+Stand-ins for the requests session used by the tests that don't need a live Confluence server.
+"""
+import json
+
+import requests
+from requests.adapters import BaseAdapter
+
+from ..confluence import Confluence
+
+HOST = "http://confluence.test"
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(body).encode('utf-8') if body is not None else b""
+        self.text = self.content.decode('utf-8')
+
+
+class FakeSession(object):
+    """
+    Stands in for a requests session.  Each request is recorded and answered by the given handler which is called
+    with the method, url, query parameters and headers of the request.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, **kwargs):
+        self.requests.append((method, url, params, headers or {}))
+        return self.handler(method, url, params, headers or {})
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    A transport adapter for a real requests session that records each prepared request (after requests has applied
+    its auth, netrc, etc.) and answers it with an empty JSON object instead of sending it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def fake_confluence(handler, **kwargs):
+    """
+    Creates a Confluence instance that sends its requests to a FakeSession
+    :param handler: (see FakeSession)
+    :param kwargs: Passed on to Confluence
+    :return: The Confluence instance and its FakeSession
+    """
+    session = FakeSession(handler)
+    return Confluence("user", "password", HOST, session=session, **kwargs), session
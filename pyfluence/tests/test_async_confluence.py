@@ -0,0 +1,56 @@
+import asyncio
+import json
+import os
+import unittest
+
+from unittest import TestCase
+
+from ..async_confluence import AsyncConfluence
+from ..confluence import ConfluenceResponseError
+
+
+class TestAsyncConfluence(TestCase):
+    _config = None  # type: dict
+    _data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    @classmethod
+    def setUpClass(cls):
+        # load from config
+        config_path = os.path.join(cls._data_dir, 'config.json')
+        with open(config_path, 'r') as fs:
+            cls._config = json.load(fs)
+
+    def _run(self, coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_concurrent_content(self):
+        async def run():
+            async with AsyncConfluence(self._config['username'], self._config['password'],
+                                       self._config['host']) as confluence:
+                try:
+                    await confluence.create_space(self._config['test_space'], "Test Space", "Test Space Description")
+                except ConfluenceResponseError as e:
+                    if e.status_code != 400:
+                        raise e
+
+                # create several pages at once
+                content_obs = await asyncio.gather(*[
+                    confluence.create_content(
+                        space_key=self._config['test_space'],
+                        content_type="page",
+                        title=f"Test Async Page {i}",
+                        html_markup="<h1>This is a test page</h1>",
+                    ) for i in range(3)
+                ])
+
+                # then read them back at once
+                fetched_obs = await asyncio.gather(*[confluence.get_content(c['id']) for c in content_obs])
+                self.assertEqual([c['id'] for c in content_obs], [c['id'] for c in fetched_obs])
+
+                await asyncio.gather(*[confluence.delete_content(page_id=c['id']) for c in content_obs])
+
+        self._run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import TestCase, mock
+
+import requests
+
+from ..confluence import Confluence
+from .fakes import HOST, RecordingAdapter
+
+
+def basic(username, password):
+    return "Basic " + base64.b64encode(f"{username}:{password}".encode('utf-8')).decode('ascii')
+
+
+class TestAuth(TestCase):
+    def setUp(self):
+        # a netrc file with other credentials for the same host
+        self._home = tempfile.mkdtemp()
+        netrc_path = os.path.join(self._home, '.netrc')
+        with open(netrc_path, 'w') as fs:
+            fs.write("machine confluence.test login netrcuser password netrcpass\n")
+        os.chmod(netrc_path, 0o600)
+
+        env = mock.patch.dict(os.environ, {'HOME': self._home, 'NETRC': netrc_path})
+        env.start()
+        self.addCleanup(env.stop)
+        self.adapter = RecordingAdapter()
+
+    def tearDown(self):
+        shutil.rmtree(self._home)
+
+    def test_own_session_ignores_netrc(self):
+        confluence = Confluence("realuser", "realpass", HOST)
+        confluence._session.mount('http://', self.adapter)
+
+        confluence.get_content("1")
+        self.assertEqual(self.adapter.requests[-1].headers['Authorization'], basic("realuser", "realpass"))
+
+    def test_given_session_ignores_netrc(self):
+        session = requests.Session()
+        session.mount('http://', self.adapter)
+        confluence = Confluence("realuser", "realpass", HOST, session=session)
+
+        confluence.get_content("1")
+        self.assertEqual(self.adapter.requests[-1].headers['Authorization'], basic("realuser", "realpass"))
+
+        # the session itself is left alone so its other requests still use netrc
+        session.get(f"{HOST}/other")
+        self.assertEqual(self.adapter.requests[-1].headers['Authorization'], basic("netrcuser", "netrcpass"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,8 @@ import json
 
 from unittest import TestCase
 
-from ..confluence import Confluence, ConfluenceResponseError, UPDATE_REPLACE, UPDATE_PREPEND
+from ..confluence import Confluence, ConfluenceResponseError, ConfluenceVersionConflictError, UPDATE_REPLACE, \
+    UPDATE_PREPEND
 
 
 class TestConfluence(TestCase):
@@ -33,7 +34,7 @@ class TestConfluence(TestCase):
     @classmethod
     def tearDownClass(cls):
         # cls._confluence.delete_space(cls._config['test_space'])
-        pass
+        cls._confluence.close()
 
     def test_content(self):
         # create content
@@ -66,7 +67,7 @@ class TestConfluence(TestCase):
         )
 
         # create child page
-        self._confluence.create_content(
+        child_ob = self._confluence.create_content(
             parent_content_id=content_ob['id'],
             space_key=self._config['test_space'],
             content_type="page",
@@ -78,9 +79,58 @@ class TestConfluence(TestCase):
         self.assertTrue('size' in children)
         self.assertTrue(children['size'] > 0)
 
+        ancestors = self._confluence.get_content_ancestors(child_ob['id'])
+        self.assertEqual(ancestors[-1]['id'], content_ob['id'])
+
         # delete content
         self._confluence.delete_content(page_id=content_ob['id'])
 
+    def test_content_raw_update(self):
+        content_ob = self._confluence.create_content(
+            space_key=self._config['test_space'],
+            content_type="page",
+            title="Test Raw Update Page",
+            html_markup="<h1>This is a test page</h1>",
+        )
+
+        # update without fetching the page first
+        updated_ob = self._confluence.update_content_raw(
+            page_id=content_ob['id'],
+            body="<h1>This is a raw update</h1>",
+            version=content_ob['version']['number'],
+            title=content_ob['title'],
+            space_key=self._config['test_space']
+        )
+        self.assertEqual(updated_ob['version']['number'], content_ob['version']['number'] + 1)
+
+        # updating from the old version again is a conflict
+        with self.assertRaises(ConfluenceVersionConflictError):
+            self._confluence.update_content_raw(
+                page_id=content_ob['id'],
+                body="<h1>This is a stale update</h1>",
+                version=content_ob['version']['number'],
+                title=content_ob['title'],
+                space_key=self._config['test_space']
+            )
+
+        self._confluence.delete_content(page_id=content_ob['id'])
+
+    def test_content_many(self):
+        content_ids = [self._confluence.create_content(
+            space_key=self._config['test_space'],
+            content_type="page",
+            title=f"Test Many Page {i}",
+            html_markup="<h1>This is a test page</h1>",
+        )['id'] for i in range(3)]
+
+        content_obs = self._confluence.get_content_many(content_ids)
+        self.assertEqual(list(content_obs.keys()), content_ids)
+        self.assertEqual([c['id'] for c in content_obs.values()], content_ids)
+
+        self._confluence.delete_content_many(content_ids)
+        content_obs = self._confluence.get_content_many(content_ids)
+        self.assertEqual(list(content_obs.values()), [None] * len(content_ids))
+
     def test_search(self):
 
         self._confluence.create_content(
@@ -0,0 +1,15 @@
+import unittest
+
+from unittest import TestCase
+
+from ..confluence import _json_dumps, _json_loads
+
+
+class TestJson(TestCase):
+    def test_non_string_keys(self):
+        # the json module accepts these so the orjson path has to as well
+        self.assertEqual(_json_loads(_json_dumps({1: "a", "b": {2: None}})), {"1": "a", "b": {"2": None}})
+
+
+if __name__ == '__main__':
+    unittest.main()
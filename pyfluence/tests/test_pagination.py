@@ -0,0 +1,75 @@
+import time
+import unittest
+
+from unittest import TestCase
+
+from ..confluence import PAGINATION_WORKERS
+from .fakes import FakeResponse, fake_confluence
+
+
+class TestPagination(TestCase):
+    def _confluence(self, total, reported_total=None, first_page_size=None):
+        """
+        Creates a Confluence instance whose searches return `total` items, numbered from 0.  Later pages are answered
+        sooner than earlier ones so that they complete out of order.  If first_page_size is given then the first
+        page is shorter than the limit asked for (as when a search drops results the user can't see).
+        """
+        reported_total = total if reported_total is None else reported_total
+
+        def handle(method, url, params, headers):
+            start, limit = int(params['start']), int(params['limit'])
+            if start == 0 and first_page_size is not None:
+                limit = min(limit, first_page_size)
+            time.sleep(max(0.0, 0.05 - start / 10000))
+            results = [{"id": str(i)} for i in range(start, min(start + limit, total))]
+            return FakeResponse(200, {"results": results, "start": start, "limit": limit, "size": len(results),
+                                      "totalSize": reported_total})
+
+        return fake_confluence(handle, cache_ttl=0)
+
+    def test_page_order(self):
+        confluence, session = self._confluence(total=450)
+
+        results = confluence._paginated_query("search", limit=50, max_results=None)
+        self.assertEqual(results['size'], 450)
+        self.assertEqual([r['id'] for r in results['results']], [str(i) for i in range(450)])
+        self.assertEqual(len(session.requests), 9)
+
+    def test_short_first_page(self):
+        confluence, session = self._confluence(total=100, first_page_size=10)
+
+        # the later pages are asked for in the size of the first so that they don't overlap
+        results = confluence._paginated_query("search", limit=50, max_results=None)
+        self.assertEqual([r['id'] for r in results['results']], [str(i) for i in range(100)])
+        self.assertEqual({r[2]['limit'] for r in session.requests[1:]}, {10})
+
+    def test_max_results(self):
+        confluence, session = self._confluence(total=1000)
+
+        results = confluence._paginated_query("search", limit=100, max_results=250)
+        self.assertEqual([r['id'] for r in results['results']], [str(i) for i in range(250)])
+        self.assertEqual(len(session.requests), 3)
+
+    def test_stop_early(self):
+        confluence, session = self._confluence(total=1000)
+
+        items = confluence._iter_paginated("search", limit=10, max_results=None)
+        self.assertEqual([next(items)['id'] for _ in range(3)], ["0", "1", "2"])
+        items.close()
+
+        # only the first page and the ones fetched ahead of it were requested
+        time.sleep(0.1)
+        self.assertLessEqual(len(session.requests), 1 + PAGINATION_WORKERS)
+
+    def test_size_mismatch(self):
+        confluence, session = self._confluence(total=90, reported_total=100)
+
+        with self.assertLogs('pyfluence.confluence', level='WARNING') as logs:
+            results = confluence._paginated_query("search", limit=25, max_results=None)
+
+        self.assertEqual(results['size'], 90)
+        self.assertIn("pagination size mismatch", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
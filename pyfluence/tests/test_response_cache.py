@@ -0,0 +1,98 @@
+import unittest
+
+from unittest import TestCase, mock
+
+from .fakes import FakeResponse, fake_confluence
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.version = 1
+
+    def _handle(self, method, url, params, headers):
+        if method == 'GET':
+            etag = f'"v{self.version}"'
+            if headers.get('If-None-Match') == etag:
+                return FakeResponse(304, headers={'ETag': etag})
+            return FakeResponse(200, {"id": "1", "title": "Page", "version": {"number": self.version}},
+                                headers={'ETag': etag})
+
+        self.version += 1
+        return FakeResponse(200, {"id": "1", "version": {"number": self.version}})
+
+    def _confluence(self, **kwargs):
+        return fake_confluence(self._handle, **kwargs)
+
+    def _gets(self, session):
+        return [r for r in session.requests if r[0] == 'GET']
+
+    def test_ttl_hit(self):
+        confluence, session = self._confluence(cache_ttl=60)
+
+        first = confluence.get_content("1")
+        second = confluence.get_content("1")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self._gets(session)), 1)
+
+        # different expand is a different request
+        confluence.get_content("1", expand=("version",))
+        self.assertEqual(len(self._gets(session)), 2)
+
+    def test_copies(self):
+        confluence, session = self._confluence(cache_ttl=60)
+
+        first = confluence.get_content("1")
+        first['title'] = "Changed by the caller"
+        second = confluence.get_content("1")
+        self.assertEqual(second['title'], "Page")
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self._gets(session)), 1)
+
+    def test_invalidate_after_write(self):
+        confluence, session = self._confluence(cache_ttl=60)
+
+        confluence.get_content("1")
+        confluence.update_content_raw("1", body="<p>new</p>", version=1, title="Page", space_key="TEST")
+        updated = confluence.get_content("1")
+        self.assertEqual(updated['version']['number'], 2)
+        self.assertEqual(len(self._gets(session)), 2)
+
+    def test_etag_revalidation(self):
+        confluence, session = self._confluence(cache_ttl=0)
+
+        first = confluence.get_content("1")
+        second = confluence.get_content("1")
+        self.assertEqual(first, second)
+
+        gets = self._gets(session)
+        self.assertEqual(len(gets), 2)
+        self.assertNotIn('If-None-Match', gets[0][3])
+        self.assertEqual(gets[1][3]['If-None-Match'], '"v1"')
+
+        # once the page changes the server sends the new version in full
+        self.version = 2
+        self.assertEqual(confluence.get_content("1")['version']['number'], 2)
+
+    def test_byte_budget(self):
+        def handle(method, url, params, headers):
+            start, limit = int(params['start']), int(params['limit'])
+            results = [{"id": str(i), "body": "x" * 1000} for i in range(start, min(start + limit, 500))]
+            return FakeResponse(200, {"results": results, "start": start, "limit": limit, "size": len(results),
+                                      "totalSize": 500})
+
+        confluence, session = fake_confluence(handle, cache_ttl=60)
+
+        # walking a large result only keeps the most recent pages that fit
+        with mock.patch('pyfluence.confluence.RESPONSE_CACHE_BYTES', 500000):
+            results = list(confluence.search_iter("type=page", max_results=None))
+            self.assertEqual(len(results), 500)
+
+            cached = confluence._response_cache.values()
+            self.assertLessEqual(confluence._response_cache_bytes, 500000)
+            self.assertEqual(confluence._response_cache_bytes, sum(len(c[1]) for c in cached))
+            self.assertGreater(len(cached), 0)
+            self.assertLess(len(cached), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -73,8 +73,8 @@ setup(
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=[
-        'munch',
         'requests',
+        'requests-toolbelt',
         'cement'
     ],
 
@@ -85,6 +85,7 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'fast': ['orjson', 'brotli'],
     },
 
     # If there are data files included in your packages that need to be